@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Shared OpenCV helpers for imgquality and pi_mavlink_quality: display detection, OpenCV threading
+setup, camera opening and the threaded capture loop (importing this module changes no global state)
+"""
+
+import collections
+import functools
+import os
+import queue
+import sys
+import threading
+import cv2
+import numpy as np
+
+# Linux without an X11/Wayland display (e.g. a Pi over SSH or as a service): skip the preview window
+HEADLESS = sys.platform.startswith("linux") and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY")
+
+def configure_opencv():
+    """Process-wide OpenCV setup, called once from each entry point's main()"""
+    # Keep the SIMD kernels on and cap the worker pool at the core count (at most 4, as on a
+    # Raspberry Pi) so parallel row stripes don't oversubscribe the CPU alongside the capture,
+    # logging and MAVLink reader threads
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(min(4, os.cpu_count() or 1))
+
+def open_camera(index=0, width=1280, height=720, fps=30, backend=cv2.CAP_ANY):
+    """Open a camera and configure it for live analysis (check isOpened() on the result)"""
+    cap = cv2.VideoCapture(index, backend)
+    if cap.isOpened():
+        # Keep only the newest frame queued so feedback is at most one frame old (set first; some
+        # backends ignore it after the format is negotiated) and ask for MJPG so the camera
+        # compresses instead of the USB link carrying raw frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    return cap
+
+def start_capture(cap, maxsize=2, drop_oldest=False, stats=None):
+    """Start a capture thread for cap; returns its frame queue, stop event and thread"""
+    frames = queue.Queue(maxsize=maxsize)
+    stop_event = threading.Event()
+    capture_thread = threading.Thread(target=capture_frames, args=(cap, frames, stop_event, drop_oldest, stats),
+                                      daemon=True)
+    capture_thread.start()
+    return frames, stop_event, capture_thread
+
+def stop_capture(stop_event, capture_thread):
+    """Stop a capture thread started by start_capture"""
+    stop_event.set()
+    capture_thread.join()
+
+def capture_frames(cap, frames, stop_event, drop_oldest=False, stats=None):
+    """Capture thread: decode frames into reused buffers and queue them (None marks a failed read)
+    
+    While the queue is full new frames are grabbed but not decoded, or with drop_oldest decoded
+    and queued in place of the oldest waiting frame; stats["dropped"] counts the frames lost
+    """
+    # Enough buffers for a full queue, the frame being analyzed and the one being read;
+    # retrieve allocates only on first use or if the frame size changes
+    buffers = [None] * (frames.maxsize + 2)
+    # The last frames queued and not dropped: whatever is still queued plus the one being analyzed
+    in_use = collections.deque(maxlen=frames.maxsize + 1)
+    
+    while not stop_event.is_set():
+        # Always grab to keep the stream current, but only decode frames that will be queued
+        if not cap.grab():
+            break
+        if frames.full():
+            if not drop_oldest:
+                if stats is not None:
+                    stats["dropped"] += 1
+                continue  # Analysis is behind: skip decoding this frame
+            try:
+                dropped = frames.get_nowait()
+            except queue.Empty:
+                pass  # Analysis took it in the meantime
+            else:
+                in_use = collections.deque((buf for buf in in_use if buf is not dropped), maxlen=in_use.maxlen)
+                if stats is not None:
+                    stats["dropped"] += 1
+        
+        index = next(i for i, buf in enumerate(buffers) if not any(buf is used for used in in_use))
+        ret, frame = cap.retrieve(buffers[index])
+        if not ret:
+            break
+        buffers[index] = frame
+        in_use.append(frame)
+        frames.put(frame)  # only this thread puts, so the room made above is still there
+    
+    # Tell the main loop capture has ended (unless it is the one stopping us)
+    while not stop_event.is_set():
+        try:
+            frames.put(None, timeout=0.1)
+            break
+        except queue.Full:
+            pass
+
+# Overlay text is drawn like cv2.putText(frame, text, position, FONT_HERSHEY_SIMPLEX, scale, colour, 2)
+_TEXT_FONT, _TEXT_THICKNESS = cv2.FONT_HERSHEY_SIMPLEX, 2
+
+@functools.lru_cache(maxsize=16)
+def _text_sprite(lines):
+    """Rasterized (text, position, scale, colour) lines: colour layer and inverse coverage, anchored at (0, 0)"""
+    width, height = 1, 1
+    for text, (x, y), scale, _ in lines:
+        (text_width, _), baseline = cv2.getTextSize(text, _TEXT_FONT, scale, _TEXT_THICKNESS)
+        width = max(width, x + text_width + _TEXT_THICKNESS + 1)
+        height = max(height, y + baseline + _TEXT_THICKNESS + 1)
+    
+    # Text rendered over black gives colour * coverage; the same text in white gives the coverage itself
+    layer = np.zeros((height, width, 3), dtype=np.uint8)
+    coverage = np.zeros((height, width, 3), dtype=np.uint8)
+    for text, position, scale, color in lines:
+        cv2.putText(layer, text, position, _TEXT_FONT, scale, color, _TEXT_THICKNESS)
+        cv2.putText(coverage, text, position, _TEXT_FONT, scale, (255, 255, 255), _TEXT_THICKNESS)
+    return layer, cv2.bitwise_not(coverage)
+
+def draw_text_lines(frame, lines):
+    """Draw a tuple of (text, position, scale, colour) lines, compositing a sprite cached per distinct set
+    of lines instead of calling putText for each line on every frame"""
+    layer, inverse_coverage = _text_sprite(lines)
+    h, w = min(layer.shape[0], frame.shape[0]), min(layer.shape[1], frame.shape[1])
+    region = frame[:h, :w]
+    # Stays in uint8 (frame * (255 - coverage) / 255 + layer) so the blend is cheaper than the putText calls
+    background = cv2.multiply(region, inverse_coverage[:h, :w], scale=1 / 255)
+    cv2.add(background, layer[:h, :w], dst=region)
@@ -6,22 +6,111 @@ Uses OpenCV + TensorFlow Lite for intelligent crop detection and quality assessm
 
 import cv2
 import numpy as np
+import collections
+import functools
 import json
+import math
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import queue
+import signal
 import subprocess
+import threading
 try:
     import tflite_runtime.interpreter as tflite
     TFLITE_AVAILABLE = True
 except ImportError:
     TFLITE_AVAILABLE = False
-import requests
+try:
+    # Only CUDA-enabled OpenCV builds (e.g. on Jetson) report a device here
+    CUDA_AVAILABLE = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    CUDA_AVAILABLE = False
 import tempfile
 import zipfile
+from enum import IntEnum
+from cv_utils import HEADLESS, configure_opencv, draw_text_lines, open_camera, start_capture, stop_capture
+
+class QualityStatus(IntEnum):
+    """Per-metric quality status codes (str() gives the display text from STATUS_LABELS)"""
+    TOO_DARK = 0
+    ACCEPTABLE_BRIGHTNESS = 1
+    OPTIMAL_BRIGHTNESS = 2
+    TOO_BRIGHT = 3
+    LOW_CONTRAST = 4
+    GOOD_CONTRAST = 5
+    HIGH_CONTRAST = 6
+    BLURRY = 7
+    GOOD_SHARPNESS = 8
+    VERY_SHARP = 9
+    LOW_COVERAGE = 10
+    GOOD_COVERAGE = 11
+    HIGH_COVERAGE = 12
+    LOW_TEXTURE = 13
+    GOOD_TEXTURE = 14
+    HIGH_TEXTURE = 15
+    LOW_NOISE = 16
+    ACCEPTABLE_NOISE = 17
+    HIGH_NOISE = 18
+    EXCELLENT_HEALTH = 19
+    GOOD_HEALTH = 20
+    MODERATE_HEALTH = 21
+    POOR_HEALTH = 22
+    HEALTH_ANALYSIS_FAILED = 23
+    
+    def __str__(self):
+        # Display text only; comparisons stay on the integer code
+        return STATUS_LABELS[self]
+
+# Display text for each QualityStatus, indexed by status code
+STATUS_LABELS = (
+    "Too Dark", "Acceptable Brightness", "Optimal Brightness", "Too Bright",
+    "Low Contrast", "Good Contrast", "High Contrast",
+    "Blurry", "Good Sharpness", "Very Sharp",
+    "Low Crop Coverage", "Good Crop Coverage", "High Crop Coverage",
+    "Low Texture Detail", "Good Texture Detail", "High Texture Detail",
+    "Low Noise", "Acceptable Noise", "High Noise",
+    "Excellent Health", "Good Health", "Moderate Health", "Poor Health", "Health Analysis Failed"
+)
 
 class CropFieldQualityAnalyzer:
-    def __init__(self, crop_type="general", weather_condition="clear", drone_height=None, close_up_mode=False):
+    # Status-scored metrics in overall-score order (crop health is scored from its value and comes last)
+    _SCORED_METRICS = ("sharpness", "brightness", "contrast", "green_coverage", "texture_variance", "noise")
+    
+    # Metrics classified into QualityStatus bands, in analyze_batch's stacking order
+    _BANDED_METRICS = ("brightness", "contrast", "sharpness", "green_coverage", "texture_variance", "noise")
+    
+    # Positioning feedback and adjustment for each status that needs one, checked in this metric order
+    _ADJUSTED_METRICS = ("brightness", "sharpness", "green_coverage", "texture_variance", "noise")
+    _STATUS_ADJUSTMENTS = {
+        QualityStatus.TOO_DARK: ("Move closer by 0.5-1.0m for better lighting",
+                                 {"action": "decrease_altitude", "value": 0.75, "type": "lighting"}),
+        QualityStatus.TOO_BRIGHT: ("Move farther by 0.5-1.0m to reduce overexposure",
+                                   {"action": "increase_altitude", "value": 0.75, "type": "lighting"}),
+        QualityStatus.BLURRY: ("Move closer by 1.0-1.5m for sharper crop details",
+                               {"action": "decrease_altitude", "value": 1.25, "type": "focus"}),
+        QualityStatus.VERY_SHARP: ("Sharpness is excellent! Consider moving slightly farther for wider coverage",
+                                   {"action": "increase_altitude", "value": 0.5, "type": "coverage"}),
+        QualityStatus.LOW_COVERAGE: ("Adjust camera angle downward or move closer to focus on crop field",
+                                     {"action": "adjust_angle", "value": "downward", "type": "coverage"}),
+        QualityStatus.LOW_TEXTURE: ("Move closer by 0.5-1.0m for better crop detail detection",
+                                    {"action": "decrease_altitude", "value": 0.75, "type": "detail"}),
+        QualityStatus.HIGH_NOISE: ("Move slightly farther to reduce noise",
+                                   {"action": "increase_altitude", "value": 0.5, "type": "noise"})
+    }
+    
+    # Drone control action for each feedback priority (0 = optimal ... 3 = critical)
+    _PRIORITY_ACTIONS = (
+        {"command": "maintain_position", "reason": "Optimal quality achieved"},
+        {"command": "fine_tune", "reason": "Minor quality issues"},
+        {"command": "gradual_adjustment", "reason": "Moderate quality issues"},
+        {"command": "immediate_adjustment", "reason": "Critical quality issues"}
+    )
+    
+    def __init__(self, crop_type="general", weather_condition="clear", drone_height=None, close_up_mode=False,
+                 analysis_scale=0.25, use_cuda=CUDA_AVAILABLE, change_threshold=256, headless=HEADLESS,
+                 log_to_file=False):
         """
         Initialize analyzer with crop-specific parameters and AI models
         
@@ -30,6 +119,15 @@ class CropFieldQualityAnalyzer:
             weather_condition: Current weather (clear, cloudy, overcast, etc.)
             drone_height: Current drone height in meters (from telemetry)
             close_up_mode: Enable close-up mode for table/desk scenarios
+            analysis_scale: Downscale factor for whole-frame statistics (1.0 = full resolution)
+            use_cuda: Run frame upload, resize and colour conversion on the GPU via cv2.cuda
+            change_threshold: L1 distance between 16x16 gray thumbnails below which a frame counts as
+                unchanged and reuses the previous analysis, provided its centre detail (Laplacian
+                variance) also stayed within 25%. The default, a mean change of one gray level per
+                thumbnail pixel, is about a 5 px pan or a 1% exposure change on 720p footage, while
+                sensor noise alone stays under ~45 (0 = analyze every frame)
+            headless: Skip the on-frame overlay and preview window (no display attached)
+            log_to_file: Append every log_analysis entry to a daily crop_quality_YYYYMMDD.jsonl file
         """
         self.crop_type = crop_type
         self.weather_condition = weather_condition
@@ -37,15 +135,44 @@ class CropFieldQualityAnalyzer:
         self.frame_count = 0
         self.quality_history = []
         self.close_up_mode = close_up_mode
+        self.analysis_scale = analysis_scale
+        self.use_cuda = use_cuda
+        self.change_threshold = change_threshold
+        self.headless = headless
+        self.log_to_file = log_to_file
+        self._last_thumb = np.zeros((16, 16), dtype=np.uint8)
+        self._last_detail = 0.0
+        self._last_analysis = None
+        if self.use_cuda:
+            self._cuda_stream = cv2.cuda.Stream()
+            self._gpu_frame = cv2.cuda_GpuMat()
         
         # Crop-specific parameters
         self.crop_params = self._get_crop_parameters()
         
+        # HSV bounds used every frame, built once instead of per call
+        lower_green, upper_green = self.crop_params["green_range"]
+        self._green_lo = np.array(lower_green, dtype=np.uint8)
+        self._green_hi = np.array(upper_green, dtype=np.uint8)
+        
+        # Healthy-green band used by crop health; when the crop range is the same band
+        # (general/corn) its pixel count is shared with coverage instead of summed twice
+        self._healthy_lo = (35, 50, 50)
+        self._healthy_hi = (85, 255, 255)
+        self._coverage_is_healthy = (tuple(lower_green) == self._healthy_lo and
+                                     tuple(upper_green) == self._healthy_hi)
+        
+        # Saturation/value bin width for the joint HSV histogram: chosen so every S/V bound
+        # (crop range and the 50 floor used for health) falls exactly on a bin edge
+        sv_bounds = [50, *lower_green[1:], *(u + 1 for u in upper_green[1:] if u < 255)]
+        self._sv_step = math.gcd(*sv_bounds)
+        self._sv_bins = -(-256 // self._sv_step)
+        
         # Weather-based adjustments
-        self._get_weather_adjustments()
+        self.weather_adjustments = self._get_weather_adjustments()
         
         # Quality thresholds (adjusted based on crop, weather, and close-up mode)
-        self.thresholds = self._calculate_thresholds()
+        self._update_thresholds()
         
         # Initialize TensorFlow Lite models
         self.tflite_models = {}
@@ -55,6 +182,37 @@ class CropFieldQualityAnalyzer:
         self.detection_cache = {}
         self.cache_valid_frames = 30  # Cache results for 30 frames
         
+        # Overall score: weights by importance for crop monitoring (_SCORED_METRICS, then crop health)
+        # and the score for each scored QualityStatus code (same order as STATUS_LABELS; health is scored by value)
+        self._score_weights = np.array([0.20, 0.15, 0.10, 0.15, 0.10, 0.05, 0.25])
+        self._status_scores = np.array([
+            30, 80, 100, 40,   # Too Dark, Acceptable, Optimal, Too Bright
+            40, 80, 90,        # Low, Good, High Contrast
+            20, 90, 100,       # Blurry, Good Sharpness, Very Sharp
+            30, 80, 90,        # Low, Good, High Crop Coverage
+            40, 80, 90,        # Low, Good, High Texture Detail
+            90, 70, 40         # Low, Acceptable, High Noise
+        ], dtype=np.uint8)
+        
+        # Scratch buffers for per-frame intermediates, reused instead of reallocated every frame
+        self._scratch_buffers = {}
+        
+        # Log entries are written by a background thread so disk I/O never blocks the frame loop;
+        # bounded so a stalled SD card drops entries instead of growing memory
+        self._log_queue = queue.Queue(maxsize=64)
+        self.dropped_log_entries = 0
+        self.failed_log_entries = 0
+        self._log_thread = None
+        
+        # Saved frames are JPEG-encoded by a second background thread (an encode is 10-30 ms on a Pi);
+        # at most 8 frames are held, further saves are dropped until the writer catches up
+        self._frame_queue = queue.Queue(maxsize=8)
+        self.dropped_frames = 0
+        self._frame_thread = None
+        
+        # Last 100 crop_analysis_data.json records, loaded from disk on the first save only
+        self._analysis_records = None
+        
     # def update_drone_height(self, height):  # Commented out height functionality
     #     """Update current drone height from telemetry"""
     #     self.drone_height = height
@@ -204,13 +362,9 @@ class CropFieldQualityAnalyzer:
         }
         return adjustments.get(self.weather_condition, adjustments["clear"])
     
-    def _auto_detect_close_up_mode(self, gray):
-        """Auto-detect if we're in close-up mode based on image characteristics"""
+    def _auto_detect_close_up_mode(self, mean_intensity, std_intensity):
+        """Auto-detect if we're in close-up mode based on image characteristics (gray mean and std)"""
         try:
-            # Calculate image statistics
-            mean_intensity = np.mean(gray)
-            std_intensity = np.std(gray)
-            
             # Close-up images typically have:
             # - Lower overall brightness (closer to objects)
             # - Higher contrast (more detail visible)
@@ -220,11 +374,11 @@ class CropFieldQualityAnalyzer:
             if mean_intensity < 100 and std_intensity > 40:
                 if not self.close_up_mode:
                     self.close_up_mode = True
-                    self.thresholds = self._calculate_thresholds()  # Recalculate with new mode
+                    self._update_thresholds()  # Recalculate with new mode
             elif mean_intensity > 120 and std_intensity < 35:
                 if self.close_up_mode:
                     self.close_up_mode = False
-                    self.thresholds = self._calculate_thresholds()  # Recalculate with new mode
+                    self._update_thresholds()  # Recalculate with new mode
                     
         except Exception as e:
             pass  # Silently fail if detection fails
@@ -284,53 +438,244 @@ class CropFieldQualityAnalyzer:
                 }
             }
     
+    def _update_thresholds(self):
+        """Recalculate thresholds and the status bands derived from them"""
+        self.thresholds = self._calculate_thresholds()
+        t = self.thresholds
+        S = QualityStatus
+        
+        # Each metric maps to (sorted band edges, status per band); a value is classified with
+        # a single searchsorted call instead of an if/elif ladder. An edge is the smallest value
+        # in the band above it under the original comparisons: a `value < min` check keeps min
+        # itself in the upper band, while `value > optimal` and `abs(value - optimal) < 20` keep
+        # the threshold in the lower one, so those edges sit one float step past the threshold
+        edge, b = self._band_edge, t["brightness"]
+        above = lambda limit: edge(limit, lambda value: value > limit)
+        self.status_bands = {
+            "brightness": (
+                np.array([b["min"], edge(b["optimal"] - 20, lambda value: abs(value - b["optimal"]) < 20),
+                          edge(b["optimal"] + 20, lambda value: abs(value - b["optimal"]) >= 20),
+                          above(b["max"])]),
+                (S.TOO_DARK, S.ACCEPTABLE_BRIGHTNESS, S.OPTIMAL_BRIGHTNESS, S.ACCEPTABLE_BRIGHTNESS, S.TOO_BRIGHT)
+            ),
+            "contrast": (
+                np.array([t["contrast"]["min"], above(t["contrast"]["optimal"])]),
+                (S.LOW_CONTRAST, S.GOOD_CONTRAST, S.HIGH_CONTRAST)
+            ),
+            "sharpness": (
+                np.array([t["sharpness"]["min"], above(t["sharpness"]["optimal"])]),
+                (S.BLURRY, S.GOOD_SHARPNESS, S.VERY_SHARP)
+            ),
+            "green_coverage": (
+                np.array([t["green_coverage"]["min"], above(t["green_coverage"]["optimal"])]),
+                (S.LOW_COVERAGE, S.GOOD_COVERAGE, S.HIGH_COVERAGE)
+            ),
+            "texture_variance": (
+                np.array([t["texture_variance"]["min"], above(t["texture_variance"]["optimal"])]),
+                (S.LOW_TEXTURE, S.GOOD_TEXTURE, S.HIGH_TEXTURE)
+            ),
+            "noise": (
+                np.array([5.0, 15.0]),
+                (S.LOW_NOISE, S.ACCEPTABLE_NOISE, S.HIGH_NOISE)
+            )
+        }
+        
+        # Bounded metrics get a precomputed lookup table (status per whole unit), so the per-frame
+        # classification is a single index: intensities and noise (a mean absolute residual <= 255).
+        # Truncating a value to its unit is only exact when every edge is a whole number (e.g. not
+        # the fractional overcast/sunny contrast edges, nor an edge one step past a `>` threshold);
+        # other metrics keep the searchsorted
+        self.status_luts = {}
+        for metric, size in (("brightness", 256), ("contrast", 256), ("noise", 256)):
+            edges, statuses = self.status_bands[metric]
+            if np.all(edges == np.floor(edges)):
+                bands = np.searchsorted(edges, np.arange(size), side="right")
+                self.status_luts[metric] = tuple(statuses[band] for band in bands)
+        
+        # All banded metrics side by side for classifying many values in one broadcast compare:
+        # edges padded with +inf to a common width, statuses flattened with a per-metric offset
+        width = max(len(self.status_bands[metric][0]) for metric in self._BANDED_METRICS)
+        self._band_edges = np.full((len(self._BANDED_METRICS), width), np.inf)
+        band_statuses = []
+        self._band_offsets = np.empty(len(self._BANDED_METRICS), dtype=np.intp)
+        for i, metric in enumerate(self._BANDED_METRICS):
+            edges, statuses = self.status_bands[metric]
+            self._band_edges[i, :len(edges)] = edges
+            self._band_offsets[i] = len(band_statuses)
+            band_statuses.extend(statuses)
+        self._band_statuses = np.array(band_statuses, dtype=np.uint8)
+    
+    @staticmethod
+    def _band_edge(threshold, in_upper_band):
+        """Smallest float near threshold for which in_upper_band(value) holds (a monotonic comparison)"""
+        value = threshold
+        while in_upper_band(value):
+            value = np.nextafter(value, -np.inf)
+        while not in_upper_band(value):
+            value = np.nextafter(value, np.inf)
+        return float(value)
+    
+    def _scratch(self, name, shape, dtype=np.uint8):
+        """Reusable scratch buffer for a per-frame intermediate (one per name and size)"""
+        key = (name, shape, dtype)
+        buf = self._scratch_buffers.get(key)
+        if buf is None:
+            buf = self._scratch_buffers[key] = np.empty(shape, dtype)
+        return buf
+    
+    def _batch_scratch(self, name, n, frame_shape):
+        """Scratch stack for n frames: one buffer per name, kept at the largest batch size seen so far"""
+        buf = self._scratch_buffers.get(name)
+        if buf is None or len(buf) < n or buf.shape[1:] != frame_shape:
+            buf = self._scratch_buffers[name] = np.empty((n,) + frame_shape, np.uint8)
+        return buf[:n]
+    
+    def _classify(self, metric, value):
+        """Map a metric value to its QualityStatus band"""
+        if metric in self.status_luts:
+            lut = self.status_luts[metric]
+            return lut[min(max(int(value), 0), len(lut) - 1)]
+        
+        edges, statuses = self.status_bands[metric]
+        return statuses[int(np.searchsorted(edges, value, side="right"))]
+    
+    def _analysis_geometry(self, frame):
+        """Downscaled size (width, height) and full-resolution centre crop (x, y, w, h) for a frame"""
+        height, width = frame.shape[:2]
+        small_size = (int(width * self.analysis_scale + 0.5), int(height * self.analysis_scale + 0.5))
+        crop = (width // 4, height // 4, width * 3 // 4 - width // 4, height * 3 // 4 - height // 4)
+        return small_size, crop
+    
+    def _prepare_frame(self, frame):
+        """Grayscale + HSV of the downscaled frame and grayscale of the full-resolution centre crop"""
+        if self.use_cuda:
+            try:
+                return self._prepare_frame_cuda(frame)
+            except cv2.error:
+                self.use_cuda = False  # GPU path unavailable, fall back to the CPU for good
+        
+        # Whole-frame statistics (brightness, contrast, colour coverage) run on a downscaled copy
+        small_size, (x, y, w, h) = self._analysis_geometry(frame)
+        if self.analysis_scale != 1.0:
+            small = self._scratch("small", (small_size[1], small_size[0], 3))
+            cv2.resize(frame, small_size, dst=small, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        gray = self._scratch("gray", small.shape[:2])
+        hsv = self._scratch("hsv", small.shape)
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+        cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=hsv)
+        
+        # Detail metrics (sharpness, focus, texture, noise) need full resolution, so use the centre crop
+        detail_gray = self._scratch("detail_gray", (h, w))
+        cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY, dst=detail_gray)
+        
+        return gray, hsv, detail_gray
+    
+    def _prepare_frame_cuda(self, frame):
+        """GPU version of _prepare_frame: one upload, resize/convert on one stream, download gray and HSV
+        (the detail crop stays on the device for _analyze_gradients_cuda)"""
+        stream = self._cuda_stream
+        small_size, crop = self._analysis_geometry(frame)
+        self._gpu_frame.upload(frame, stream)
+        
+        if self.analysis_scale != 1.0:
+            gpu_small = cv2.cuda.resize(self._gpu_frame, small_size, interpolation=cv2.INTER_AREA, stream=stream)
+        else:
+            gpu_small = self._gpu_frame
+        gpu_gray = cv2.cuda.cvtColor(gpu_small, cv2.COLOR_BGR2GRAY, stream=stream)
+        gpu_hsv = cv2.cuda.cvtColor(gpu_small, cv2.COLOR_BGR2HSV, stream=stream)
+        gpu_detail = cv2.cuda.cvtColor(cv2.cuda_GpuMat(self._gpu_frame, crop), cv2.COLOR_BGR2GRAY, stream=stream)
+        
+        small_shape = (small_size[1], small_size[0])
+        gray = gpu_gray.download(stream, self._scratch("gray", small_shape))
+        hsv = gpu_hsv.download(stream, self._scratch("hsv", small_shape + (3,)))
+        stream.waitForCompletion()
+        
+        return gray, hsv, gpu_detail
+    
+    def _scene_unchanged(self, frame):
+        """Whether frame matches the last analyzed one closely enough to reuse its analysis"""
+        # The 16x16 thumbnail catches layout and exposure changes but averages away blur, so
+        # detail is compared separately on a 64x64 full-resolution centre patch
+        thumb_bgr = self._scratch("thumb_bgr", (16, 16, 3))
+        cv2.resize(frame, (16, 16), dst=thumb_bgr, interpolation=cv2.INTER_AREA)
+        thumb = self._scratch("thumb", (16, 16))
+        cv2.cvtColor(thumb_bgr, cv2.COLOR_BGR2GRAY, dst=thumb)
+        
+        height, width = frame.shape[:2]
+        top, left = max(height // 2 - 32, 0), max(width // 2 - 32, 0)
+        patch = frame[top:top+64, left:left+64]
+        patch_gray = self._scratch("patch_gray", patch.shape[:2])
+        patch_laplacian = self._scratch("patch_laplacian", patch.shape[:2], np.int16)
+        cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY, dst=patch_gray)
+        cv2.Laplacian(patch_gray, cv2.CV_16S, dst=patch_laplacian)
+        detail = float(cv2.meanStdDev(patch_laplacian)[1][0, 0]) ** 2
+        
+        unchanged = (self._last_analysis is not None and
+                     cv2.norm(thumb, self._last_thumb, cv2.NORM_L1) < self.change_threshold and
+                     abs(detail - self._last_detail) <= 0.25 * self._last_detail)
+        if not unchanged:
+            np.copyto(self._last_thumb, thumb)
+            self._last_detail = detail
+        return unchanged
+    
     def analyze_frame_quality(self, frame):
         """Comprehensive frame quality analysis for crop monitoring with AI enhancement"""
+        # Reuse the last analysis while the scene is essentially unchanged (e.g. hovering),
+        # checked before any full-frame conversion
+        if self.change_threshold > 0 and self._scene_unchanged(frame):
+            return self._last_analysis
+        
         # Traditional OpenCV analysis
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        gray, hsv, detail_gray = self._prepare_frame(frame)
+        
+        # Brightness and contrast from one pass over the gray image
+        mean, stddev = cv2.meanStdDev(gray)
+        brightness = float(mean[0, 0])
+        contrast = float(stddev[0, 0])
         
         # Auto-detect close-up mode based on image characteristics
         if self.frame_count % 30 == 0:  # Check every 30 frames
-            self._auto_detect_close_up_mode(gray)
+            self._auto_detect_close_up_mode(brightness, contrast)
         
         # 1. Brightness Analysis
-        brightness = np.mean(gray)
-        brightness_score = self._calculate_brightness_score(brightness)
+        brightness_score = self._classify("brightness", brightness)
         
         # 2. Contrast Analysis
-        contrast = np.std(gray)
-        contrast_score = self._calculate_contrast_score(contrast)
+        contrast_score = self._classify("contrast", contrast)
         
-        # 3. Sharpness Analysis (Enhanced for crop details)
-        sharpness = self._analyze_sharpness(gray)
-        sharpness_score = self._calculate_sharpness_score(sharpness)
+        # 3. Sharpness and Focus Analysis (shared gradient pass)
+        sharpness, focus_score = self._analyze_gradients(detail_gray)
+        sharpness_score = self._classify("sharpness", sharpness)
+        if isinstance(detail_gray, cv2.cuda_GpuMat):
+            detail_gray = detail_gray.download()  # the texture and noise filters run on the CPU
         
-        # 4. Crop Coverage Analysis
-        green_coverage = self._analyze_crop_coverage(hsv)
-        coverage_score = self._calculate_coverage_score(green_coverage)
+        # Texture Analysis (Important for disease detection)
+        texture_variance = self._analyze_texture(detail_gray)
+        texture_score = self._classify("texture_variance", texture_variance)
         
-        # 5. Texture Analysis (Important for disease detection)
-        texture_variance = self._analyze_texture(gray)
-        texture_score = self._calculate_texture_score(texture_variance)
+        # 4. Crop Coverage Analysis (coverage and crop health share one HSV histogram pass)
+        total_pixels = hsv.shape[0] * hsv.shape[1]
+        hsv_hist = self._hsv_histogram(hsv)
+        healthy_pixels = self._count_hsv_range(hsv_hist, self._healthy_lo, self._healthy_hi)
+        green_coverage = self._analyze_crop_coverage(hsv_hist, total_pixels, healthy_pixels)
+        coverage_score = self._classify("green_coverage", green_coverage)
         
-        # 6. Focus Analysis
-        focus_score = self._analyze_focus(gray)
+        # 5. Noise Analysis
+        noise_level = self._analyze_noise(detail_gray)
+        noise_score = self._classify("noise", noise_level)
         
-        # 7. Noise Analysis
-        noise_level = self._analyze_noise(gray)
-        noise_score = self._calculate_noise_score(noise_level)
+        # 6. Enhanced Crop Health Analysis
+        crop_health = self._analyze_crop_health(hsv_hist, total_pixels, healthy_pixels)
         
-        # 8. Enhanced Crop Health Analysis
-        crop_health = self._analyze_crop_health(hsv)
-        
-        # 9. AI-Powered Analysis (if available)
+        # 7. AI-Powered Analysis (if available)
         ai_crops = None
         ai_quality = None
         
         if self.frame_count % 5 == 0:  # Run AI analysis every 5 frames for performance
             try:
-                ai_crops = self.detect_crops_ai(frame)
+                ai_crops = self.detect_crops_ai(frame, green_coverage)
                 ai_quality = self.assess_quality_ai(frame)
                 
                 # Cache AI results
@@ -365,21 +710,88 @@ class CropFieldQualityAnalyzer:
         if ai_quality:
             combined_analysis["ai_quality"] = ai_quality
         
+        self._last_analysis = combined_analysis
         return combined_analysis
     
-    def _analyze_crop_health(self, hsv):
+    def analyze_batch(self, frames):
+        """
+        Post-flight analysis of recorded footage: traditional metrics for a stack of frames at once
+        
+        Args:
+            frames: (N, H, W, 3) uint8 BGR array
+        
+        Returns:
+            Dict of metric -> (status codes, values), one array entry per frame (no AI, no mode auto-detect)
+        """
+        n, height, width = frames.shape[:3]
+        small_size, (x, y, w, h) = self._analysis_geometry(frames[0])
+        
+        # Downscale every frame into one stack, then convert the whole stack with one call per colour space
+        if self.analysis_scale != 1.0:
+            small = self._batch_scratch("batch_small", n, (small_size[1], small_size[0], 3))
+            for i in range(n):
+                cv2.resize(frames[i], small_size, dst=small[i], interpolation=cv2.INTER_AREA)
+        else:
+            small = np.ascontiguousarray(frames)
+        rows = small.reshape(-1, small.shape[2], 3)
+        gray = self._batch_scratch("batch_gray", n, small.shape[1:3])
+        hsv = self._batch_scratch("batch_hsv", n, small.shape[1:])
+        cv2.cvtColor(rows, cv2.COLOR_BGR2GRAY, dst=gray.reshape(rows.shape[:2]))
+        cv2.cvtColor(rows, cv2.COLOR_BGR2HSV, dst=hsv.reshape(rows.shape))
+        
+        # Brightness and contrast reduce over each frame's pixels in one vectorised call
+        brightness = gray.mean(axis=(1, 2))
+        contrast = gray.std(axis=(1, 2))
+        
+        # Filters and histograms stay per frame (stacking would bleed kernels across frame borders)
+        detail_gray = self._scratch("detail_gray", (h, w))
+        total_pixels = small.shape[1] * small.shape[2]
+        per_frame = np.empty((n, 6))
+        health_status = np.empty(n, dtype=np.uint8)
+        for i in range(n):
+            cv2.cvtColor(frames[i, y:y+h, x:x+w], cv2.COLOR_BGR2GRAY, dst=detail_gray)
+            sharpness, focus_score = self._analyze_gradients(detail_gray)
+            texture_variance = self._analyze_texture(detail_gray)
+            noise_level = self._analyze_noise(detail_gray)
+            hsv_hist = self._hsv_histogram(hsv[i])
+            healthy_pixels = self._count_hsv_range(hsv_hist, self._healthy_lo, self._healthy_hi)
+            green_coverage = self._analyze_crop_coverage(hsv_hist, total_pixels, healthy_pixels)
+            crop_health = self._analyze_crop_health(hsv_hist, total_pixels, healthy_pixels)
+            health_status[i], health_score = crop_health["status"], crop_health["score"]
+            per_frame[i] = (sharpness, focus_score, texture_variance, noise_level, green_coverage, health_score)
+        sharpness, focus_score, texture_variance, noise_level, green_coverage, health_score = per_frame.T
+        
+        # Classify every metric of every frame in one broadcast compare against the stacked band edges
+        values = np.stack((brightness, contrast, sharpness, green_coverage, texture_variance, noise_level))
+        bands = (self._band_edges[:, :, None] <= values[:, None, :]).sum(axis=1)
+        statuses = self._band_statuses[self._band_offsets[:, None] + bands]
+        
+        results = {metric: (statuses[i], values[i]) for i, metric in enumerate(self._BANDED_METRICS)}
+        results["focus"] = (focus_score, focus_score)
+        results["crop_health"] = (health_status, health_score)
+        return results
+    
+    def _hsv_histogram(self, hsv):
+        """Joint hue/saturation/value histogram; one pass over the image gives every colour count"""
+        size = self._sv_bins * self._sv_step
+        return cv2.calcHist([hsv], [0, 1, 2], None, [180, self._sv_bins, self._sv_bins],
+                            [0, 180, 0, size, 0, size])
+    
+    def _count_hsv_range(self, hsv_hist, lower, upper):
+        """Number of pixels inside an inclusive HSV range (same bounds as cv2.inRange)"""
+        step = self._sv_step
+        return int(hsv_hist[lower[0]:upper[0] + 1,
+                            lower[1] // step:upper[1] // step + 1,
+                            lower[2] // step:upper[2] // step + 1].sum())
+    
+    def _analyze_crop_health(self, hsv_hist, total_pixels, healthy_pixels=None):
         """Analyze crop health using color analysis"""
         try:
-            # Define color ranges for different health states
-            healthy_green = cv2.inRange(hsv, np.array([35, 50, 50]), np.array([85, 255, 255]))
-            stressed_yellow = cv2.inRange(hsv, np.array([20, 50, 50]), np.array([35, 255, 255]))
-            diseased_brown = cv2.inRange(hsv, np.array([10, 50, 50]), np.array([20, 255, 255]))
-            
-            # Calculate percentages
-            total_pixels = hsv.shape[0] * hsv.shape[1]
-            healthy_pixels = np.sum(healthy_green > 0)
-            stressed_pixels = np.sum(stressed_yellow > 0)
-            diseased_pixels = np.sum(diseased_brown > 0)
+            # Hue bands for different health states (inclusive, as with inRange)
+            if healthy_pixels is None:
+                healthy_pixels = self._count_hsv_range(hsv_hist, self._healthy_lo, self._healthy_hi)
+            stressed_pixels = self._count_hsv_range(hsv_hist, (20, 50, 50), (35, 255, 255))
+            diseased_pixels = self._count_hsv_range(hsv_hist, (10, 50, 50), (20, 255, 255))
             
             healthy_ratio = healthy_pixels / total_pixels
             stressed_ratio = stressed_pixels / total_pixels
@@ -390,13 +802,13 @@ class CropFieldQualityAnalyzer:
             
             # Determine health status
             if health_score > 0.8:
-                status = "Excellent Health"
+                status = QualityStatus.EXCELLENT_HEALTH
             elif health_score > 0.6:
-                status = "Good Health"
+                status = QualityStatus.GOOD_HEALTH
             elif health_score > 0.4:
-                status = "Moderate Health"
+                status = QualityStatus.MODERATE_HEALTH
             else:
-                status = "Poor Health"
+                status = QualityStatus.POOR_HEALTH
             
             return {
                 "status": status,
@@ -408,69 +820,101 @@ class CropFieldQualityAnalyzer:
             
         except Exception as e:
             return {
-                "status": "Health Analysis Failed",
+                "status": QualityStatus.HEALTH_ANALYSIS_FAILED,
                 "score": 0.0
             }
     
-    def _analyze_sharpness(self, gray):
-        """Enhanced sharpness analysis using multiple methods"""
-        # Laplacian variance
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-        laplacian_var = laplacian.var()
-        
-        # Sobel edge detection
-        sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        sobel_magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
-        sobel_mean = np.mean(sobel_magnitude)
+    def _analyze_gradients(self, gray):
+        """Sharpness and focus from a single Laplacian + Sobel pass over the image"""
+        if isinstance(gray, cv2.cuda_GpuMat):
+            try:
+                return self._analyze_gradients_cuda(gray)
+            except cv2.error:
+                self.use_cuda = False  # GPU path unavailable, fall back to the CPU for good
+                gray = gray.download()
+        
+        # The 8-bit Laplacian fits in int16 (|response| <= 4*255), half the traffic of float32
+        laplacian = self._scratch("laplacian", gray.shape, np.int16)
+        sobel_x = self._scratch("sobel_x", gray.shape, np.float32)
+        sobel_y = self._scratch("sobel_y", gray.shape, np.float32)
+        cv2.Laplacian(gray, cv2.CV_16S, dst=laplacian)
+        cv2.Sobel(gray, cv2.CV_32F, 1, 0, dst=sobel_x, ksize=3)
+        cv2.Sobel(gray, cv2.CV_32F, 0, 1, dst=sobel_y, ksize=3)
+        
+        # Gradient magnitude in one fused pass, written in place over sobel_x
+        magnitude = cv2.magnitude(sobel_x, sobel_y, sobel_x)
+        
+        # Combined sharpness metric (Laplacian variance + mean Sobel magnitude)
+        _, laplacian_std = cv2.meanStdDev(laplacian)
+        sharpness = float(laplacian_std[0, 0]) ** 2 * 0.7 + cv2.mean(magnitude)[0] * 0.3
+        
+        # Focus: Tenengrad on the central region, reusing the same gradients
+        center_y, center_x = gray.shape[0] // 2, gray.shape[1] // 2
+        roi = magnitude[max(center_y-64, 0):center_y+64, max(center_x-64, 0):center_x+64]
+        focus_score = cv2.mean(roi)[0]
         
-        # Combined sharpness metric
-        return (laplacian_var * 0.7 + sobel_mean * 0.3)
+        return sharpness, focus_score
     
-    def _analyze_crop_coverage(self, hsv):
-        """Analyze crop coverage with crop-specific color ranges"""
-        lower_green, upper_green = self.crop_params["green_range"]
-        mask = cv2.inRange(hsv, np.array(lower_green), np.array(upper_green))
-        
-        # Calculate coverage ratio
-        total_pixels = mask.shape[0] * mask.shape[1]
-        green_pixels = np.sum(mask > 0)
-        coverage_ratio = green_pixels / total_pixels
-        
-        return coverage_ratio
+    def _analyze_gradients_cuda(self, gpu_gray):
+        """GPU version of _analyze_gradients: filters stay on the device, only sums are downloaded"""
+        if not hasattr(self, "_cuda_filters"):
+            self._cuda_filters = (
+                cv2.cuda.createLaplacianFilter(cv2.CV_32FC1, cv2.CV_32FC1, ksize=1),
+                cv2.cuda.createSobelFilter(cv2.CV_32FC1, cv2.CV_32FC1, 1, 0, ksize=3),
+                cv2.cuda.createSobelFilter(cv2.CV_32FC1, cv2.CV_32FC1, 0, 1, ksize=3)
+            )
+        laplacian_filter, sobel_x_filter, sobel_y_filter = self._cuda_filters
+        
+        # CUDA filters need matching input/output types, so filter a float copy of the crop
+        gray_f = gpu_gray.convertTo(cv2.CV_32F)
+        laplacian = laplacian_filter.apply(gray_f)
+        magnitude = cv2.cuda.magnitude(sobel_x_filter.apply(gray_f), sobel_y_filter.apply(gray_f))
+        
+        # Same statistics as the CPU path, from device-side reductions: sum(L) and sum(L^2)
+        height, width = gpu_gray.size()[::-1]
+        n = height * width
+        laplacian_mean = cv2.cuda.sum(laplacian)[0] / n
+        laplacian_sq_mean = cv2.cuda.sqrSum(laplacian)[0] / n
+        
+        sharpness = (laplacian_sq_mean - laplacian_mean ** 2) * 0.7 + cv2.cuda.sum(magnitude)[0] / n * 0.3
+        
+        # Focus: Tenengrad on the central region
+        top, left = max(height // 2 - 64, 0), max(width // 2 - 64, 0)
+        roi_h, roi_w = min(height // 2 + 64, height) - top, min(width // 2 + 64, width) - left
+        focus_score = cv2.cuda.sum(cv2.cuda_GpuMat(magnitude, (left, top, roi_w, roi_h)))[0] / (roi_h * roi_w)
+        
+        return sharpness, focus_score
     
     def _analyze_texture(self, gray):
         """Analyze texture variance for crop detail detection"""
         # Apply Gaussian blur to get texture
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        texture = cv2.absdiff(gray, blurred)
+        blurred = self._scratch("blurred", gray.shape)
+        cv2.GaussianBlur(gray, (5, 5), 0, dst=blurred)
+        texture = cv2.absdiff(gray, blurred, dst=blurred)
         return np.var(texture)
     
-    def _analyze_focus(self, gray):
-        """Analyze focus using frequency domain analysis"""
-        # FFT for focus analysis
-        f_transform = np.fft.fft2(gray)
-        f_shift = np.fft.fftshift(f_transform)
-        magnitude_spectrum = np.log(np.abs(f_shift) + 1)
-        
-        # Calculate focus score based on high-frequency content
-        center_y, center_x = gray.shape[0] // 2, gray.shape[1] // 2
-        high_freq_region = magnitude_spectrum[center_y-50:center_y+50, center_x-50:center_x+50]
-        focus_score = np.mean(high_freq_region)
-        
-        return focus_score
-    
     def _analyze_noise(self, gray):
         """Analyze noise level in the image"""
         # Apply median filter to estimate noise
-        median_filtered = cv2.medianBlur(gray, 3)
-        noise = cv2.absdiff(gray, median_filtered)
-        return np.mean(noise)
+        median_filtered = self._scratch("median", gray.shape)
+        cv2.medianBlur(gray, 3, dst=median_filtered)
+        noise = cv2.absdiff(gray, median_filtered, dst=median_filtered)
+        return cv2.mean(noise)[0]
     
-    def detect_crops_ai(self, frame):
-        """AI-powered crop detection using TensorFlow Lite"""
+    def _analyze_crop_coverage(self, hsv_hist, total_pixels, healthy_pixels=None):
+        """Analyze crop coverage with crop-specific color ranges"""
+        if healthy_pixels is not None and self._coverage_is_healthy:
+            green_pixels = healthy_pixels
+        else:
+            green_pixels = self._count_hsv_range(hsv_hist, self._green_lo, self._green_hi)
+        coverage_ratio = green_pixels / total_pixels
+        
+        return coverage_ratio
+    
+    def detect_crops_ai(self, frame, green_coverage=None):
+        """AI-powered crop detection using TensorFlow Lite (green_coverage: this frame's coverage, if known)"""
         if 'crop_detection' not in self.tflite_models:
-            return self._fallback_crop_detection(frame)
+            return self._fallback_crop_detection(frame, green_coverage)
         
         try:
             # Preprocess frame for AI model
@@ -492,7 +936,7 @@ class CropFieldQualityAnalyzer:
             return crops
             
         except Exception as e:
-            return self._fallback_crop_detection(frame)
+            return self._fallback_crop_detection(frame, green_coverage)
     
     def assess_quality_ai(self, frame):
         """AI-powered quality assessment using TensorFlow Lite"""
@@ -523,16 +967,17 @@ class CropFieldQualityAnalyzer:
         """Preprocess frame for AI model input"""
         # Resize to model input size (typically 224x224 or 299x299)
         input_size = (224, 224)
-        resized = cv2.resize(frame, input_size)
+        resized = self._scratch("ai_resized", (input_size[1], input_size[0], 3))
+        cv2.resize(frame, input_size, dst=resized)
         
         # Convert BGR to RGB
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        
-        # Normalize pixel values to [0, 1]
-        normalized = rgb.astype(np.float32) / 255.0
+        rgb = self._scratch("ai_rgb", resized.shape)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=rgb)
         
-        # Add batch dimension
-        batched = np.expand_dims(normalized, axis=0)
+        # Normalize pixel values to [0, 1] straight into the batched input tensor
+        # (set_tensor copies it, so the buffer is reused next call)
+        batched = self._scratch("ai_input", (1,) + rgb.shape, np.float32)
+        np.divide(rgb, np.float32(255.0), out=batched[0])
         
         return batched
     
@@ -586,15 +1031,20 @@ class CropFieldQualityAnalyzer:
         }
         return crop_classes.get(class_id, 'unknown_crop')
     
-    def _fallback_crop_detection(self, frame):
+    def _fallback_crop_detection(self, frame, green_coverage=None):
         """Fallback crop detection using OpenCV color-based methods"""
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        height, width = frame.shape[:2]
         
-        # Use existing crop coverage analysis
-        green_coverage = self._analyze_crop_coverage(hsv)
+        # Coverage already measured for this frame needs no second HSV conversion; otherwise only
+        # the crop's green range is needed, so a single inRange + countNonZero beats the full histogram
+        if green_coverage is None:
+            hsv = self._scratch("fallback_hsv", frame.shape)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+            green_mask = self._scratch("fallback_mask", (height, width))
+            cv2.inRange(hsv, self._green_lo, self._green_hi, dst=green_mask)
+            green_coverage = cv2.countNonZero(green_mask) / (height * width)
         
         # Create a simple crop detection result
-        height, width = frame.shape[:2]
         crops = [{
             'bbox': (0, 0, width, height),
             'class_id': 0,
@@ -608,15 +1058,17 @@ class CropFieldQualityAnalyzer:
     def _fallback_quality_assessment(self, frame):
         """Fallback quality assessment using traditional OpenCV methods"""
         # Use basic analysis methods to avoid recursion
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        gray = self._scratch("fallback_gray", frame.shape[:2])
+        hsv = self._scratch("fallback_hsv", frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
         
         # Basic metrics
-        brightness = np.mean(gray)
-        contrast = np.std(gray)
-        sharpness = self._analyze_sharpness(gray)
-        green_coverage = self._analyze_crop_coverage(hsv)
-        crop_health = self._analyze_crop_health(hsv)
+        mean, stddev = cv2.meanStdDev(gray)
+        brightness = float(mean[0, 0])
+        contrast = float(stddev[0, 0])
+        sharpness = self._analyze_gradients(gray)[0]
+        crop_health = self._analyze_crop_health(self._hsv_histogram(hsv), hsv.shape[0] * hsv.shape[1])
         
         # Convert to AI-style output format
         quality_assessment = {
@@ -629,64 +1081,8 @@ class CropFieldQualityAnalyzer:
         
         return quality_assessment
     
-    def _calculate_brightness_score(self, brightness):
-        """Calculate brightness quality score"""
-        if brightness < self.thresholds["brightness"]["min"]:
-            return "Too Dark"
-        elif brightness > self.thresholds["brightness"]["max"]:
-            return "Too Bright"
-        elif abs(brightness - self.thresholds["brightness"]["optimal"]) < 20:
-            return "Optimal Brightness"
-        else:
-            return "Acceptable Brightness"
-    
-    def _calculate_contrast_score(self, contrast):
-        """Calculate contrast quality score"""
-        if contrast < self.thresholds["contrast"]["min"]:
-            return "Low Contrast"
-        elif contrast > self.thresholds["contrast"]["optimal"]:
-            return "High Contrast"
-        else:
-            return "Good Contrast"
-    
-    def _calculate_sharpness_score(self, sharpness):
-        """Calculate sharpness quality score"""
-        if sharpness < self.thresholds["sharpness"]["min"]:
-            return "Blurry"
-        elif sharpness > self.thresholds["sharpness"]["optimal"]:
-            return "Very Sharp"
-        else:
-            return "Good Sharpness"
-    
-    def _calculate_coverage_score(self, coverage):
-        """Calculate crop coverage quality score"""
-        if coverage < self.thresholds["green_coverage"]["min"]:
-            return "Low Crop Coverage"
-        elif coverage > self.thresholds["green_coverage"]["optimal"]:
-            return "High Crop Coverage"
-        else:
-            return "Good Crop Coverage"
-    
-    def _calculate_texture_score(self, texture):
-        """Calculate texture quality score"""
-        if texture < self.thresholds["texture_variance"]["min"]:
-            return "Low Texture Detail"
-        elif texture > self.thresholds["texture_variance"]["optimal"]:
-            return "High Texture Detail"
-        else:
-            return "Good Texture Detail"
-    
-    def _calculate_noise_score(self, noise):
-        """Calculate noise quality score"""
-        if noise < 5:
-            return "Low Noise"
-        elif noise < 15:
-            return "Acceptable Noise"
-        else:
-            return "High Noise"
-    
-    def get_drone_position_feedback(self, analysis):
-        """Generate precise drone positioning recommendations"""
+    def get_drone_position_feedback(self, analysis, quality_score=None):
+        """Generate precise drone positioning recommendations (pass quality_score if already computed)"""
         feedback = []
         priority = 0
         adjustments = []
@@ -706,7 +1102,8 @@ class CropFieldQualityAnalyzer:
         #         feedback.append(f"Optimal height: {self.drone_height:.1f}m")
         
         # Smart positioning logic based on current quality
-        quality_score = self.calculate_overall_quality_score(analysis)
+        if quality_score is None:
+            quality_score = self.calculate_overall_quality_score(analysis)
         
         # If quality is already good, don't recommend moving closer
         if quality_score >= 80:
@@ -723,39 +1120,15 @@ class CropFieldQualityAnalyzer:
             feedback.append("Poor quality. Significant adjustments needed")
             priority = 3
         
-        # Brightness adjustments - only if significantly off
-        if "Too Dark" in analysis["brightness"][0]:
-            feedback.append("Move closer by 0.5-1.0m for better lighting")
-            adjustments.append({"action": "decrease_altitude", "value": 0.75, "type": "lighting"})
-        elif "Too Bright" in analysis["brightness"][0]:
-            feedback.append("Move farther by 0.5-1.0m to reduce overexposure")
-            adjustments.append({"action": "increase_altitude", "value": 0.75, "type": "lighting"})
-        
-        # Sharpness adjustments - only if very blurry
-        if "Blurry" in analysis["sharpness"][0]:
-            feedback.append("Move closer by 1.0-1.5m for sharper crop details")
-            adjustments.append({"action": "decrease_altitude", "value": 1.25, "type": "focus"})
-        elif "Very Sharp" in analysis["sharpness"][0]:
-            feedback.append("Sharpness is excellent! Consider moving slightly farther for wider coverage")
-            adjustments.append({"action": "increase_altitude", "value": 0.5, "type": "coverage"})
-        
-        # Coverage adjustments - only if coverage is very low
-        if "Low Crop Coverage" in analysis["green_coverage"][0]:
-            feedback.append("Adjust camera angle downward or move closer to focus on crop field")
-            adjustments.append({"action": "adjust_angle", "value": "downward", "type": "coverage"})
-        
-        # Texture adjustments - only if texture is very poor
-        if "Low Texture Detail" in analysis["texture_variance"][0]:
-            feedback.append("Move closer by 0.5-1.0m for better crop detail detection")
-            adjustments.append({"action": "decrease_altitude", "value": 0.75, "type": "detail"})
-        
-        # Noise adjustments - only if noise is very high
-        if "High Noise" in analysis["noise"][0]:
-            feedback.append("Move slightly farther to reduce noise")
-            adjustments.append({"action": "increase_altitude", "value": 0.5, "type": "noise"})
+        # Per-metric adjustments: only statuses that are significantly off have an entry
+        for metric in self._ADJUSTED_METRICS:
+            entry = self._STATUS_ADJUSTMENTS.get(analysis[metric][0])
+            if entry:
+                feedback.append(entry[0])
+                adjustments.append(dict(entry[1]))
         
         # Crop health adjustments
-        if "Poor Health" in analysis["crop_health"][0]:
+        if analysis["crop_health"][0] == QualityStatus.POOR_HEALTH:
             feedback.append("Focus on this area for detailed disease monitoring")
         
         # If no specific adjustments needed but quality is moderate
@@ -814,7 +1187,7 @@ class CropFieldQualityAnalyzer:
                 "footage_quality": round(footage_quality, 1),
                 "action_needed": action_needed,
                 "current_height": current_height,
-                "timestamp": time.strftime('%H:%M:%S'),
+                "timestamp": _clock_time(int(time.time())),
                 "frame_count": self.frame_count
             }
             
@@ -841,73 +1214,41 @@ class CropFieldQualityAnalyzer:
         try:
             filename = "crop_analysis_data.json"
             
-            # Load existing data if file exists
-            existing_data = []
-            if os.path.exists(filename):
-                try:
-                    with open(filename, 'r') as f:
-                        existing_data = json.load(f)
-                except:
-                    existing_data = []
+            # Load existing data once; after that the file only mirrors the in-memory records
+            # instead of being re-read and re-parsed every frame
+            if self._analysis_records is None:
+                existing_data = []
+                if os.path.exists(filename):
+                    try:
+                        with open(filename, 'r') as f:
+                            existing_data = json.load(f)
+                    except:
+                        existing_data = []
+                # Keep only last 100 entries to prevent file from getting too large
+                self._analysis_records = collections.deque(existing_data, maxlen=100)
             
             # Add new data
-            existing_data.append(data)
-            
-            # Keep only last 100 entries to prevent file from getting too large
-            if len(existing_data) > 100:
-                existing_data = existing_data[-100:]
+            self._analysis_records.append(data)
             
             # Save back to file
             with open(filename, 'w') as f:
-                json.dump(existing_data, f, indent=2)
+                json.dump(list(self._analysis_records), f, indent=2)
                 
         except Exception as e:
             pass  # Silently fail if can't save
     
     def calculate_overall_quality_score(self, analysis):
-        """Calculate overall quality score (0-100)"""
-        scores = []
-        
-        # Weighted scoring based on importance for crop monitoring
-        weights = {
-            "sharpness": 0.20,
-            "brightness": 0.15,
-            "contrast": 0.10,
-            "green_coverage": 0.15,
-            "texture_variance": 0.10,
-            "noise": 0.05,
-            "crop_health": 0.25
-        }
-        
-        for metric, weight in weights.items():
-            if metric in analysis:
-                if metric == "crop_health":
-                    # Crop health is already normalized (0-1)
-                    score = analysis[metric][1] * 100
-                else:
-                    score = self._metric_to_score(analysis[metric][0])
-                scores.append(score * weight)
-        
-        return sum(scores) if scores else 0
-    
-    def _metric_to_score(self, status):
-        """Convert status to numerical score"""
-        score_map = {
-            "Too Dark": 30, "Too Bright": 40, "Optimal Brightness": 100, "Acceptable Brightness": 80,
-            "Low Contrast": 40, "Good Contrast": 80, "High Contrast": 90,
-            "Blurry": 20, "Good Sharpness": 90, "Very Sharp": 100,
-            "Low Crop Coverage": 30, "Good Crop Coverage": 80, "High Crop Coverage": 90,
-            "Low Texture Detail": 40, "Good Texture Detail": 80, "High Texture Detail": 90,
-            "Low Noise": 90, "Acceptable Noise": 70, "High Noise": 40
-        }
-        return score_map.get(status, 50)
+        """Calculate overall quality score (0-100); also accepts analyze_batch results (one score per frame)"""
+        ids = np.array([analysis[metric][0] for metric in self._SCORED_METRICS])
+        # Crop health is already normalized (0-1)
+        scores = np.concatenate((self._status_scores[ids], [np.asarray(analysis["crop_health"][1]) * 100]))
+        overall = self._score_weights @ scores
+        return float(overall) if overall.ndim == 0 else overall
     
     def log_analysis(self, analysis, feedback, priority, quality_score):
         """Log analysis results for drone control system"""
-        timestamp = datetime.now().isoformat()
-        
         log_entry = {
-            "timestamp": timestamp,
+            "timestamp": _iso_timestamp(time.time_ns()),
             "frame_count": self.frame_count,
             "crop_type": self.crop_type,
             "weather_condition": self.weather_condition,
@@ -918,67 +1259,149 @@ class CropFieldQualityAnalyzer:
             "recommendations": self._generate_drone_commands(priority, feedback)
         }
         
-        # Save to file for drone control system - Commented out to prevent file spam
-        # self._save_to_file(log_entry)
+        # Save to file for drone control system (opt-in: one JSON line per frame in a daily file)
+        if self.log_to_file:
+            self._save_to_file(log_entry)
         
         return log_entry
     
     def _generate_drone_commands(self, priority, feedback):
         """Generate specific drone control commands"""
-        commands = {
+        # Actions are shared read-only dicts; they are only ever serialized
+        return {
             "priority": priority,
-            "actions": []
+            "actions": [self._PRIORITY_ACTIONS[min(priority, 3)]]
         }
-        
-        if priority == 0:
-            commands["actions"].append({"command": "maintain_position", "reason": "Optimal quality achieved"})
-        elif priority >= 3:
-            commands["actions"].append({"command": "immediate_adjustment", "reason": "Critical quality issues"})
-        elif priority >= 2:
-            commands["actions"].append({"command": "gradual_adjustment", "reason": "Moderate quality issues"})
-        else:
-            commands["actions"].append({"command": "fine_tune", "reason": "Minor quality issues"})
-        
-        return commands
     
     def _save_to_file(self, log_entry):
-        """Save analysis results to file for drone control system"""
-        filename = f"crop_quality_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        """Queue analysis results for the background log writer"""
+        if self._log_thread is None:
+            self._log_thread = threading.Thread(target=self._log_writer, daemon=True)
+            self._log_thread.start()
+        try:
+            self._log_queue.put_nowait(log_entry)
+        except queue.Full:
+            self.dropped_log_entries += 1
+    
+    def _log_writer(self):
+        """Append queued log entries as JSON lines to crop_quality_YYYYMMDD.jsonl"""
+        log_file = None
+        next_rotation = 0.0
+        last_flush = 0.0
         
+        while True:
+            log_entry = self._log_queue.get()
+            if log_entry is None:
+                break
+            
+            try:
+                # Rotate to a new file at midnight; the filename is only rebuilt then
+                now = time.time()
+                if now >= next_rotation:
+                    if log_file:
+                        log_file.close()
+                    today = datetime.fromtimestamp(now)
+                    log_file = open(f"crop_quality_{today:%Y%m%d}.jsonl", 'a', buffering=1 << 16)
+                    midnight = today.replace(hour=0, minute=0, second=0, microsecond=0)
+                    next_rotation = (midnight + timedelta(days=1)).timestamp()
+                
+                # (status, value) codes are written as their display labels; other entries
+                # (e.g. the ai_quality dict) are written as they are
+                record = dict(log_entry, analysis={
+                    metric: (str(value[0]), value[1])
+                    if isinstance(value, tuple) and isinstance(value[0], QualityStatus) else value
+                    for metric, value in log_entry["analysis"].items()
+                })
+                # default=float covers any numpy scalars left in the entry
+                log_file.write(json.dumps(record, separators=(',', ':'), default=float) + '\n')
+                
+                # Buffered writes, flushed about once a second so a crash loses little
+                if now - last_flush >= 1.0:
+                    log_file.flush()
+                    last_flush = now
+            except Exception as e:
+                # Skip the entry but keep count; report the first failure so it isn't silent
+                self.failed_log_entries += 1
+                if self.failed_log_entries == 1:
+                    print(f"⚠️ Could not write analysis log entry: {e}")
+        
+        if log_file:
+            log_file.close()
+    
+    def queue_frame(self, filename, image):
+        """Queue an image for the background frame writer; returns False if it was dropped"""
+        if self._frame_thread is None:
+            self._frame_thread = threading.Thread(target=self._frame_writer, daemon=True)
+            self._frame_thread.start()
         try:
-            with open(filename, 'w') as f:
-                json.dump(log_entry, f, indent=2)
-        except Exception as e:
-            pass
+            self._frame_queue.put_nowait((filename, image))
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+        return True
+    
+    def _frame_writer(self):
+        """Write queued (filename, image) pairs with cv2.imwrite"""
+        while True:
+            item = self._frame_queue.get()
+            if item is None:
+                break
+            
+            filename, image = item
+            try:
+                if not cv2.imwrite(filename, image):
+                    print(f"⚠️ Could not save frame {filename}")
+            except cv2.error as e:
+                print(f"⚠️ Could not save frame {filename}: {e}")
+    
+    def close(self):
+        """Flush pending log entries and saved frames, then stop the background writers"""
+        if self._log_thread is not None:
+            self._log_queue.put(None)
+            self._log_thread.join()
+            self._log_thread = None
+        if self._frame_thread is not None:
+            self._frame_queue.put(None)
+            self._frame_thread.join()
+            self._frame_thread = None
 
 def main():
     """Main function with AI-enhanced crop quality analysis"""
     print("🌾 Crop Quality Analysis")
     print("=" * 30)
+    configure_opencv()
     
     # Initialize analyzer with crop type and weather condition, enable close-up mode for table scenarios
     analyzer = CropFieldQualityAnalyzer(crop_type="general", weather_condition="clear", close_up_mode=True)
     
     # Initialize camera (0 for USB webcam, adjust for Pi Camera if needed)
-    cap = cv2.VideoCapture(0)
+    cap = open_camera(0)
     
     if not cap.isOpened():
         print("❌ Error: Could not open camera.")
         return
     
-    # Set camera properties for better quality
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    # Capture runs on its own thread so the camera keeps streaming while a frame is analyzed;
+    # the bounded queue drops frames instead of letting them pile up behind slow analysis
+    frames, stop_event, capture_thread = start_capture(cap, maxsize=2)
+    
+    # Ctrl+C / SIGINT stops the loop cleanly; it is the only way to quit without a preview window
+    previous_sigint = signal.signal(signal.SIGINT, lambda signum, stack: stop_event.set())
     
     print("📹 Camera ready")
     print("🌾 Crop:", analyzer.crop_type.title())
-    print("\n🎯 Analysis started - Press 'q' to quit, 'i' for status")
+    if analyzer.headless:
+        print("\n🎯 Analysis started (headless) - Press Ctrl+C to quit")
+    else:
+        print("\n🎯 Analysis started - Press 'q' to quit, 'i' for status")
     
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+        while not stop_event.is_set():
+            try:
+                frame = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if frame is None:
                 print("❌ Error: Could not read frame.")
                 break
             
@@ -987,25 +1410,28 @@ def main():
             # Analyze frame quality with AI enhancement
             analysis = analyzer.analyze_frame_quality(frame)
             
-            # Get drone positioning feedback
-            feedback, priority, adjustments = analyzer.get_drone_position_feedback(analysis)
-            
             # Calculate overall quality score
             quality_score = analyzer.calculate_overall_quality_score(analysis)
             
+            # Get drone positioning feedback
+            feedback, priority, adjustments = analyzer.get_drone_position_feedback(analysis, quality_score)
+            
             # Log analysis for drone control
             log_entry = analyzer.log_analysis(analysis, feedback, priority, quality_score)
             
             # Display simplified status
             crop_health_score = analysis.get('crop_health', [None, 0])[1] * 100 if 'crop_health' in analysis else 0
             
-            print(f"[{time.strftime('%H:%M:%S')}] 🌾 {analyzer.crop_type.title()} | 📹 {quality_score:.0f}/100 | 🌱 {crop_health_score:.0f}/100 | {'🟢 Optimal' if priority == 0 else '🟡 Adjust' if priority <= 2 else '🔴 Move Closer'}")
+            print(f"[{_clock_time(int(time.time()))}] 🌾 {analyzer.crop_type.title()} | 📹 {quality_score:.0f}/100 | 🌱 {crop_health_score:.0f}/100 | {'🟢 Optimal' if priority == 0 else '🟡 Adjust' if priority <= 2 else '🔴 Move Closer'}")
             
             # Save analysis data to file
             success, saved_data = analyzer.send_analysis_data(analysis, quality_score, priority)
             if success:
                 print(f"💾 Saved: {saved_data['crop_name']} | Q:{saved_data['footage_quality']} | Action:{saved_data['action_needed']}")
             
+            if analyzer.headless:
+                continue
+            
             # Display results on frame
             display_results(frame, analysis, feedback, priority, quality_score, analyzer)
             
@@ -1021,46 +1447,70 @@ def main():
                 print(f"\n📊 Status: {analyzer.crop_type.title()} | Quality: {quality_score:.0f}/100 | Action: {'Optimal' if priority == 0 else 'Adjust' if priority <= 2 else 'Move Closer'}")
     
     finally:
+        signal.signal(signal.SIGINT, previous_sigint)
+        stop_capture(stop_event, capture_thread)
         cap.release()
-        cv2.destroyAllWindows()
+        if not analyzer.headless:
+            cv2.destroyAllWindows()
+        analyzer.close()
         print("\n✅ Analysis completed")
 
+@functools.lru_cache(maxsize=1)
+def _clock_time(second):
+    """HH:MM:SS for a whole second (formatted once per second rather than every frame)"""
+    return time.strftime('%H:%M:%S', time.localtime(second))
+
+@functools.lru_cache(maxsize=1)
+def _iso_second(second):
+    """ISO 8601 local date and time for a whole second (formatted once per second rather than every frame)"""
+    return datetime.fromtimestamp(second).isoformat()
+
+def _iso_timestamp(time_ns):
+    """Epoch nanoseconds as datetime.isoformat() would give it (microseconds omitted when zero)"""
+    second, nanoseconds = divmod(time_ns, 1_000_000_000)
+    microseconds = nanoseconds // 1000
+    return f"{_iso_second(second)}.{microseconds:06d}" if microseconds else _iso_second(second)
+
+# On-screen panel: corners (0, 0)-(400, 200) inclusive, darkened to 30% of the frame behind it
+_PANEL_SIZE = (201, 401)
+
 def display_results(frame, analysis, feedback, priority, quality_score, analyzer=None):
     """Display simplified analysis results on the frame"""
-    # Create overlay for better visibility
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (0, 0), (400, 200), (0, 0, 0), -1)
-    cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+    if analyzer is not None and analyzer.headless:
+        return
     
+    # Darken the panel region for better visibility (black panel at 70% opacity is a 0.3 scale)
+    panel = frame[:_PANEL_SIZE[0], :_PANEL_SIZE[1]]
+    cv2.convertScaleAbs(panel, dst=panel, alpha=0.3)
+    
+    # Lines are collected as (text, position, font scale, colour) and drawn in one pass from a
+    # sprite that is only re-rasterized when some line's text or colour changes
+    lines = []
     y_pos = 30
     
     # 1. Crop Name and Mode
     mode_text = " (Close-up)" if analyzer and analyzer.close_up_mode else ""
-    cv2.putText(frame, f"Crop: {analyzer.crop_type.title() if analyzer else 'General'}{mode_text}", 
-               (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    lines.append((f"Crop: {analyzer.crop_type.title() if analyzer else 'General'}{mode_text}",
+                  (10, y_pos), 0.7, (255, 255, 255)))
     y_pos += 35
     
     # 2. Footage Quality (Overall Quality Score)
     color = (0, 255, 0) if quality_score >= 80 else (0, 255, 255) if quality_score >= 60 else (0, 0, 255)
-    cv2.putText(frame, f"Footage Quality: {quality_score:.0f}/100", 
-               (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    lines.append((f"Footage Quality: {quality_score:.0f}/100", (10, y_pos), 0.7, color))
     y_pos += 35
     
     # 3. Crop Quality (Crop Health)
     if "crop_health" in analysis:
         crop_health_score = analysis['crop_health'][1] * 100
         crop_color = (0, 255, 0) if crop_health_score >= 80 else (0, 255, 255) if crop_health_score >= 60 else (0, 0, 255)
-        cv2.putText(frame, f"Crop Quality: {crop_health_score:.0f}/100", 
-                   (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, crop_color, 2)
+        lines.append((f"Crop Quality: {crop_health_score:.0f}/100", (10, y_pos), 0.7, crop_color))
         y_pos += 35
     
     # 4. Height Information
     if analyzer and hasattr(analyzer, 'drone_height') and analyzer.drone_height is not None:
-        cv2.putText(frame, f"Height: {analyzer.drone_height:.1f}m", 
-                   (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        lines.append((f"Height: {analyzer.drone_height:.1f}m", (10, y_pos), 0.7, (0, 255, 255)))
     else:
-        cv2.putText(frame, "Height: Not Available", 
-                   (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (128, 128, 128), 2)
+        lines.append(("Height: Not Available", (10, y_pos), 0.7, (128, 128, 128)))
     y_pos += 35
     
     # 5. Action Required (Close/Far)
@@ -1077,11 +1527,12 @@ def display_results(frame, analysis, feedback, priority, quality_score, analyzer
         action_text = "Action: Fine Tune"
         action_color = (0, 255, 255)
     
-    cv2.putText(frame, action_text, (10, y_pos), 
-               cv2.FONT_HERSHEY_SIMPLEX, 0.7, action_color, 2)
+    lines.append((action_text, (10, y_pos), 0.7, action_color))
+    
+    draw_text_lines(frame, tuple(lines))
 
-def save_frame(frame, analysis, quality_score):
-    """Save current frame with analysis data"""
+def save_frame(frame, analysis, quality_score, analyzer=None):
+    """Save current frame with analysis data (in the background when an analyzer is given)"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"crop_frame_{timestamp}_quality_{quality_score:.1f}.jpg"
     
@@ -1090,7 +1541,11 @@ def save_frame(frame, analysis, quality_score):
     cv2.putText(save_frame, f"Quality: {quality_score:.1f}", 
                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
     
-    cv2.imwrite(filename, save_frame)
+    if analyzer is None:
+        cv2.imwrite(filename, save_frame)
+    elif not analyzer.queue_frame(filename, save_frame):
+        print(f"⚠️ Frame writer busy, {filename} not saved")
+        return
     print(f"Frame saved as {filename}")
 
 if __name__ == "__main__":
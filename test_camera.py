@@ -4,8 +4,12 @@ Simple camera test script to verify webcam access
 """
 
 import cv2
+import sys
 import time
 
+# Open V4L2 devices directly on Linux instead of letting OpenCV try GStreamer first
+CAMERA_BACKEND = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+
 def test_camera():
     print("🔍 Testing camera access...")
     
@@ -13,7 +17,7 @@ def test_camera():
     for camera_index in [0, 1, 2]:
         print(f"Trying camera index {camera_index}...")
         
-        cap = cv2.VideoCapture(camera_index)
+        cap = cv2.VideoCapture(camera_index, CAMERA_BACKEND)
         
         if not cap.isOpened():
             print(f"❌ Camera {camera_index} could not be opened")
@@ -43,12 +47,16 @@ def test_camera_stream(camera_index=0):
     """Test continuous camera stream"""
     print(f"🎥 Testing continuous stream from camera {camera_index}...")
     
-    cap = cv2.VideoCapture(camera_index)
+    cap = cv2.VideoCapture(camera_index, CAMERA_BACKEND)
     
     if not cap.isOpened():
         print("❌ Could not open camera")
         return
     
+    # Keep one buffered frame so reads are current; set before the format, as some backends require
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    
     # Set camera properties
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the crop quality analyzer (run with: python -m unittest test_imgquality)
+"""
+
+import unittest
+
+import cv2
+import numpy as np
+
+from imgquality import CropFieldQualityAnalyzer, QualityStatus as S
+
+WEATHERS = ("clear", "cloudy", "overcast", "sunny")
+
+def make_analyzer(weather="clear", close_up=False, **kwargs):
+    return CropFieldQualityAnalyzer(crop_type="wheat", weather_condition=weather, close_up_mode=close_up,
+                                    use_cuda=False, headless=True, **kwargs)
+
+def expected_status(analyzer, metric, value):
+    """Status from the original if/elif comparisons for each metric"""
+    t = analyzer.thresholds
+    if metric == "brightness":
+        if value < t["brightness"]["min"]:
+            return S.TOO_DARK
+        elif value > t["brightness"]["max"]:
+            return S.TOO_BRIGHT
+        elif abs(value - t["brightness"]["optimal"]) < 20:
+            return S.OPTIMAL_BRIGHTNESS
+        return S.ACCEPTABLE_BRIGHTNESS
+    if metric == "noise":
+        return S.LOW_NOISE if value < 5 else S.ACCEPTABLE_NOISE if value < 15 else S.HIGH_NOISE
+    low, good, high = {
+        "contrast": (S.LOW_CONTRAST, S.GOOD_CONTRAST, S.HIGH_CONTRAST),
+        "sharpness": (S.BLURRY, S.GOOD_SHARPNESS, S.VERY_SHARP),
+        "green_coverage": (S.LOW_COVERAGE, S.GOOD_COVERAGE, S.HIGH_COVERAGE),
+        "texture_variance": (S.LOW_TEXTURE, S.GOOD_TEXTURE, S.HIGH_TEXTURE),
+    }[metric]
+    if value < t[metric]["min"]:
+        return low
+    elif value > t[metric]["optimal"]:
+        return high
+    return good
+
+def synthetic_frames(n, height=240, width=320, seed=0):
+    """Textured frames with a green patch and a blur/noise level that varies per frame"""
+    rng = np.random.default_rng(seed)
+    frames = np.empty((n, height, width, 3), dtype=np.uint8)
+    for i in range(n):
+        base = rng.normal(110 + 10 * i, 25 + 5 * i, (height, width, 3))
+        base[height // 4:, :width // 2] *= (0.6, 1.4, 0.6)  # greenish crop area (BGR)
+        frames[i] = np.clip(base, 0, 255)
+    return frames
+
+def threshold_values(analyzer, metric):
+    """Every threshold of a metric, plus the neighbouring floats on either side"""
+    if metric == "brightness":
+        b = analyzer.thresholds["brightness"]
+        limits = (b["min"], b["optimal"] - 20, b["optimal"] + 20, b["max"])
+    elif metric == "noise":
+        limits = (5, 15)
+    else:
+        limits = (analyzer.thresholds[metric]["min"], analyzer.thresholds[metric]["optimal"])
+    values = []
+    for limit in limits:
+        values += [np.nextafter(limit, -np.inf), limit, np.nextafter(limit, np.inf)]
+    return [float(value) for value in values]
+
+class ClassifyTest(unittest.TestCase):
+    def test_values_at_each_edge_match_original_comparisons(self):
+        for weather in WEATHERS:
+            for close_up in (False, True):
+                analyzer = make_analyzer(weather, close_up)
+                for metric in analyzer._BANDED_METRICS:
+                    for value in threshold_values(analyzer, metric):
+                        with self.subTest(weather=weather, close_up=close_up, metric=metric, value=value):
+                            self.assertEqual(analyzer._classify(metric, value),
+                                             expected_status(analyzer, metric, value))
+
+    def test_batch_edges_match_single_frame(self):
+        for weather in WEATHERS:
+            for close_up in (False, True):
+                analyzer = make_analyzer(weather, close_up)
+                for i, metric in enumerate(analyzer._BANDED_METRICS):
+                    values = np.array(threshold_values(analyzer, metric))
+                    edges = analyzer._band_edges[i]
+                    bands = (edges[:, None] <= values[None, :]).sum(axis=0)
+                    statuses = analyzer._band_statuses[analyzer._band_offsets[i] + bands]
+                    with self.subTest(weather=weather, close_up=close_up, metric=metric):
+                        self.assertEqual([S(status) for status in statuses],
+                                         [analyzer._classify(metric, value) for value in values])
+
+class SceneGateTest(unittest.TestCase):
+    def test_unchanged_frame_returns_cached_analysis(self):
+        frame = synthetic_frames(1)[0]
+        analyzer = make_analyzer()
+        first = analyzer.analyze_frame_quality(frame)
+        self.assertIs(analyzer.analyze_frame_quality(frame.copy()), first)
+
+    def test_changed_or_blurred_frame_is_analyzed_again(self):
+        frame = synthetic_frames(1)[0]
+        analyzer = make_analyzer()
+        first = analyzer.analyze_frame_quality(frame)
+        brighter = np.clip(frame.astype(np.int16) + 10, 0, 255).astype(np.uint8)
+        self.assertIsNot(analyzer.analyze_frame_quality(brighter), first)
+        second = analyzer.analyze_frame_quality(brighter)
+        blurred = analyzer.analyze_frame_quality(cv2.GaussianBlur(brighter, (9, 9), 0))
+        self.assertIsNot(blurred, second)
+        self.assertLess(blurred["sharpness"][1], second["sharpness"][1])
+
+    def test_zero_threshold_analyzes_every_frame(self):
+        frame = synthetic_frames(1)[0]
+        analyzer = make_analyzer(change_threshold=0)
+        first = analyzer.analyze_frame_quality(frame)
+        self.assertIsNot(analyzer.analyze_frame_quality(frame), first)
+
+class BatchTest(unittest.TestCase):
+    def test_batch_matches_single_frame(self):
+        frames = synthetic_frames(4)
+        analyzer = make_analyzer(close_up=True, change_threshold=0)
+        analyzer.frame_count = 1  # keep mode auto-detection out of the single-frame path
+        single = [analyzer.analyze_frame_quality(frame) for frame in frames]
+        for n in (4, 2, 3):
+            batch = analyzer.analyze_batch(frames[:n])
+            for metric, (statuses, values) in batch.items():
+                for i in range(n):
+                    with self.subTest(n=n, metric=metric, frame=i):
+                        self.assertEqual(statuses[i], single[i][metric][0])
+                        self.assertAlmostEqual(values[i], single[i][metric][1], places=6)
+
+    def test_batch_scratch_keeps_one_stack(self):
+        frames = synthetic_frames(4)
+        analyzer = make_analyzer()
+        for n in (2, 4, 3, 1):
+            analyzer.analyze_batch(frames[:n])
+        stacks = {key: buf.shape[0] for key, buf in analyzer._scratch_buffers.items() if isinstance(key, str)}
+        self.assertEqual(stacks, {"batch_small": 4, "batch_gray": 4, "batch_hsv": 4})
+
+if __name__ == "__main__":
+    unittest.main()